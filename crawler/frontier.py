@@ -2,23 +2,67 @@ import os
 import sqlite3
 import atexit
 import signal
-from threading import RLock
+import time
+import heapq
+from itertools import count
+from threading import Condition, Event, Lock, RLock, Thread
 from queue import Queue, Empty
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash, get_domain, normalize
+from utils.bloom import ScalableBloomFilter
 from scraper import is_valid
 
+_INSERT_SQL = (
+    "INSERT OR IGNORE INTO urls (urlhash, url, completed) VALUES (?, ?, 0)")
+_COMPLETE_SQL = (
+    "UPDATE urls SET completed = 1 WHERE urlhash = ? AND completed = 0")
+
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = Queue()
         self.lock = RLock()
         
-        # Tracking for periodic logging
-        self._urls_processed = 0
+        # Heap of (ready_at, seq, url); ready_at is the monotonic time the
+        # URL's domain is next free under the politeness delay, so workers
+        # always get the URL that can be fetched soonest.
+        self.to_be_downloaded = []
+        self._queue_cond = Condition(Lock())
+        self._queue_seq = count()
+        self._next_available = {}
+        # URLs handed to workers and not yet released with task_done();
+        # the crawl is done once nothing is queued or in flight.
+        self._in_flight = 0
+        self._done_event = Event()
+        
+        # Tracking for periodic logging; next() on a count is atomic, so
+        # the hot path does not need the lock to bump it.
+        self._urls_processed = count(1)
         self._log_interval = 100  # Log every N URLs
         
+        # Database writes are handed to a single background writer thread,
+        # which coalesces them into one transaction per batch.
+        self._write_q = Queue()
+        self._write_batch_size = 256  # Max writes per transaction
+        self._write_batch_window = 0.05  # Seconds to wait for a batch to fill
+        self._flush_timeout = 30.0  # Max seconds flush() waits on the writer
+        
+        # In-memory dedup; SQLite is only used for durability. A Bloom
+        # filter keeps memory at ~a few bytes per URL even for crawls that
+        # discover tens of millions of URLs.
+        self._seen_bloom = ScalableBloomFilter(
+            initial_capacity=1_000_000, error_rate=1e-7)
+        self._completed = set()
+        self._seen_lock = Lock()
+        # Completed hashes not yet handed to the writer; persisted in bulk
+        # every N completions (and on flush) instead of one item per URL.
+        self._completed_buffer = []
+        self._complete_flush_every = 64
+        
+        # Maintained counters so stats never need a COUNT(*) scan
+        self._total_count = 0
+        self._completed_count = 0
+        
         db_file = self.config.save_file + ".db"
         
         if not os.path.exists(db_file) and not restart:
@@ -27,16 +71,24 @@ class Frontier(object):
         elif os.path.exists(db_file) and restart:
             self.logger.info(f"Found save file {db_file}, deleting it.")
             os.remove(db_file)
+            # WAL mode leaves sidecar files next to the database
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(db_file + suffix):
+                    os.remove(db_file + suffix)
         
         # Initialize database
         self._init_db(db_file)
+        self._load_seen()
+        
+        self._writer = Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
         
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
             self._parse_save_file()
-            if self._get_total_count() == 0:
+            if self._total_count == 0:
                 for url in self.config.seed_urls:
                     self.add_url(url)
         
@@ -54,180 +106,283 @@ class Frontier(object):
         exit(0)
     
     def _init_db(self, db_file):
-        """Initialize SQLite database with thread-safe connection."""
+        """Open the long-lived SQLite connection shared by all workers."""
+        # One connection for the life of the Frontier; every use is
+        # serialized through self.lock, so sharing it across threads is safe.
         conn = sqlite3.connect(db_file, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA busy_timeout=30000")
         conn.execute("""
             CREATE TABLE IF NOT EXISTS urls (
-                urlhash TEXT PRIMARY KEY,
+                urlhash BLOB PRIMARY KEY,
                 url TEXT NOT NULL,
                 completed INTEGER NOT NULL DEFAULT 0
             )
         """)
         conn.commit()
-        conn.close()
+        self._migrate_hex_hashes(conn)
         
         self.db_file = db_file
+        self._conn = conn
+    
+    def _migrate_hex_hashes(self, conn):
+        """Rehash rows from save files that stored hex-string urlhashes."""
+        cursor = conn.execute(
+            "SELECT 1 FROM urls WHERE typeof(urlhash) = 'text' LIMIT 1")
+        if cursor.fetchone() is None:
+            return
+        
+        self.logger.info("Migrating save file to 8-byte urlhash keys.")
+        rows = conn.execute("SELECT url, completed FROM urls").fetchall()
+        conn.execute("DELETE FROM urls")
+        conn.executemany(
+            "INSERT OR IGNORE INTO urls (urlhash, url, completed) "
+            "VALUES (?, ?, ?)",
+            [(get_urlhash(url), url, completed) for url, completed in rows])
+        conn.commit()
     
-    def _get_connection(self):
-        """Get a thread-safe connection."""
-        return sqlite3.connect(self.db_file, check_same_thread=False)
+    def _load_seen(self):
+        """Populate the in-memory dedup structures from the database."""
+        with self.lock:
+            cursor = self._conn.execute("SELECT urlhash, completed FROM urls")
+            for urlhash, completed in cursor:
+                self._seen_bloom.add(urlhash)
+                self._total_count += 1
+                if completed:
+                    self._completed.add(urlhash)
+                    self._completed_count += 1
     
     def _parse_save_file(self):
         """Load unfinished URLs from database into queue."""
         with self.lock:
-            conn = self._get_connection()
-            try:
-                cursor = conn.execute(
-                    "SELECT url FROM urls WHERE completed = 0"
-                )
-                
-                tbd_count = 0
-                for (url,) in cursor:
-                    if is_valid(url):
-                        self.to_be_downloaded.put(url)
-                        tbd_count += 1
-                
-                total_count = self._get_total_count_with_conn(conn)
-                
-                self.logger.info(
-                    f"Found {tbd_count} urls to be downloaded from "
-                    f"{total_count} total urls discovered.")
-            finally:
-                conn.close()
-    
-    def _get_total_count(self):
-        """Get total number of URLs in database."""
-        conn = self._get_connection()
-        try:
-            return self._get_total_count_with_conn(conn)
-        finally:
-            conn.close()
-    
-    def _get_total_count_with_conn(self, conn):
-        """Helper to get count with existing connection."""
-        cursor = conn.execute("SELECT COUNT(*) FROM urls")
-        return cursor.fetchone()[0]
-    
-    def _get_completed_count(self, conn=None):
-        """Get number of completed URLs."""
-        if conn is None:
-            conn = self._get_connection()
-            close_conn = True
-        else:
-            close_conn = False
-        
-        try:
-            cursor = conn.execute("SELECT COUNT(*) FROM urls WHERE completed = 1")
-            return cursor.fetchone()[0]
-        finally:
-            if close_conn:
-                conn.close()
+            cursor = self._conn.execute(
+                "SELECT url FROM urls WHERE completed = 0"
+            )
+            
+            tbd_count = 0
+            for (url,) in cursor:
+                if is_valid(url):
+                    self._schedule(url)
+                    tbd_count += 1
+            
+            self.logger.info(
+                f"Found {tbd_count} urls to be downloaded from "
+                f"{self._total_count} total urls discovered.")
     
     def get_frontier_stats(self):
         """Get current frontier statistics (thread-safe)."""
-        with self.lock:
-            conn = self._get_connection()
-            try:
-                total = self._get_total_count_with_conn(conn)
-                completed = self._get_completed_count(conn)
-                in_queue = self.to_be_downloaded.qsize()
-                pending = total - completed
-                
-                return {
-                    'total_discovered': total,
-                    'completed': completed,
-                    'in_queue': in_queue,
-                    'pending': pending
-                }
-            finally:
-                conn.close()
-    
-    def get_tbd_url(self):
-        """Get next URL to download (thread-safe)."""
-        try:
-            url = self.to_be_downloaded.get_nowait()
-            
-            # Log frontier statistics periodically
-            with self.lock:
-                self._urls_processed += 1
-                
-                # Log every N URLs
-                if self._urls_processed % self._log_interval == 0:
-                    stats = self.get_frontier_stats()
-                    self.logger.info(
-                        f"Frontier Stats - "
-                        f"Total: {stats['total_discovered']}, "
-                        f"Completed: {stats['completed']}, "
-                        f"In Queue: {stats['in_queue']}, "
-                        f"Pending: {stats['pending']}"
-                    )
+        with self._seen_lock:
+            total = self._total_count
+            completed = self._completed_count
+            in_queue = len(self.to_be_downloaded)
+            pending = total - completed
             
-            return url
-        except Empty:
-            # Log final stats when frontier is empty
+            return {
+                'total_discovered': total,
+                'completed': completed,
+                'in_queue': in_queue,
+                'pending': pending
+            }
+    
+    def _schedule(self, url):
+        """Queue URL behind the last politeness slot reserved for its domain."""
+        domain = get_domain(url)
+        with self._queue_cond:
+            ready_at = max(time.monotonic(), self._next_available.get(domain, 0.0))
+            self._next_available[domain] = ready_at + self.config.time_delay
+            heapq.heappush(
+                self.to_be_downloaded, (ready_at, next(self._queue_seq), url))
+            self._queue_cond.notify()
+    
+    def get_tbd_url(self, timeout=0):
+        """
+        Get next URL to download, earliest-ready domain first (thread-safe).
+        Blocks up to timeout seconds for a URL to arrive, like Queue.get:
+        0 never blocks, None waits as long as it takes.
+        Returns None on timeout, or once the crawl is done.
+        Every URL returned must be released with task_done().
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        url = None
+        became_done = False
+        with self._queue_cond:
+            while not self.to_be_downloaded:
+                if self._in_flight == 0:
+                    # Nothing queued and nobody can add more: crawl is over
+                    if not self._done_event.is_set():
+                        self._done_event.set()
+                        self._queue_cond.notify_all()
+                        became_done = True
+                    break
+                if deadline is None:
+                    self._queue_cond.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._queue_cond.wait(remaining)
+            else:
+                _, _, url = heapq.heappop(self.to_be_downloaded)
+                self._in_flight += 1
+        
+        if url is None:
+            if became_done:
+                self._log_empty()
+            return None
+        
+        # Log frontier statistics every N URLs
+        if next(self._urls_processed) % self._log_interval == 0:
             stats = self.get_frontier_stats()
             self.logger.info(
-                f"Frontier EMPTY - "
+                f"Frontier Stats - "
                 f"Total: {stats['total_discovered']}, "
-                f"Completed: {stats['completed']}"
+                f"Completed: {stats['completed']}, "
+                f"In Queue: {stats['in_queue']}, "
+                f"Pending: {stats['pending']}"
             )
-            return None
+        
+        return url
+    
+    def task_done(self):
+        """Release a URL returned by get_tbd_url, processed or not."""
+        with self._queue_cond:
+            self._in_flight -= 1
+            if self._in_flight == 0 and not self.to_be_downloaded:
+                # Wake waiting workers so they notice the crawl is over
+                self._queue_cond.notify_all()
+    
+    def is_done(self):
+        """True once the frontier is empty with no URLs in flight."""
+        return self._done_event.is_set()
+    
+    def _log_empty(self):
+        """Log final stats when frontier is empty."""
+        stats = self.get_frontier_stats()
+        self.logger.info(
+            f"Frontier EMPTY - "
+            f"Total: {stats['total_discovered']}, "
+            f"Completed: {stats['completed']}"
+        )
     
     def add_url(self, url):
         """Add URL to frontier if not already seen."""
-        url = normalize(url)
-        urlhash = get_urlhash(url)
-        
-        with self.lock:
-            conn = self._get_connection()
-            try:
-                # Try to insert; if urlhash exists, this will fail silently
-                cursor = conn.execute(
-                    "INSERT OR IGNORE INTO urls (urlhash, url, completed) "
-                    "VALUES (?, ?, 0)",
-                    (urlhash, url)
-                )
-                
-                # If row was inserted, add to queue
-                if cursor.rowcount > 0:
-                    self.to_be_downloaded.put(url)
-                
-                conn.commit()
-            except sqlite3.Error as e:
-                self.logger.error(f"Database error adding {url}: {e}")
-                conn.rollback()
-            finally:
-                conn.close()
+        self.add_urls([url])
+    
+    def add_urls(self, urls):
+        """
+        Add a batch of URLs to the frontier.
+        Only URLs not seen before are queued for download; the inserts are
+        persisted asynchronously by the writer thread.
+        """
+        for url in urls:
+            url = normalize(url)
+            urlhash = get_urlhash(url)
+            
+            # A false positive only drops a single URL (p <= 1e-7), so the
+            # filter is trusted on its own rather than confirmed in SQLite.
+            with self._seen_lock:
+                if urlhash in self._seen_bloom:
+                    continue
+                self._seen_bloom.add(urlhash)
+                self._total_count += 1
+            
+            self._write_q.put(("add", urlhash, url))
+            self._schedule(url)
     
     def mark_url_complete(self, url):
         """Mark URL as completed."""
         urlhash = get_urlhash(url)
+        with self._seen_lock:
+            if urlhash in self._completed:
+                return
+            # Bloom filters have no false negatives, so a miss is definitive
+            if urlhash not in self._seen_bloom:
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+            self._completed.add(urlhash)
+            self._completed_count += 1
+            self._completed_buffer.append(urlhash)
+            if len(self._completed_buffer) < self._complete_flush_every:
+                return
+            drained, self._completed_buffer = self._completed_buffer, []
+        self._write_q.put(("done", drained))
+    
+    def _writer_loop(self):
+        """Drain the write queue, committing each batch in one transaction."""
+        while True:
+            batch = [self._write_q.get()]
+            deadline = time.monotonic() + self._write_batch_window
+            while len(batch) < self._write_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._write_q.get(timeout=remaining))
+                except Empty:
+                    break
+            
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Keep the writer alive: a dead writer would hang flush()
+                self.logger.error(
+                    f"Unexpected error writing batch of {len(batch)}: {e}")
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+    
+    def _write_batch(self, batch):
+        """Persist one batch of queued inserts and completions."""
+        adds = [(item[1], item[2]) for item in batch if item[0] == "add"]
+        dones = [(urlhash,) for item in batch if item[0] == "done"
+                 for urlhash in item[1]]
         
         with self.lock:
-            conn = self._get_connection()
             try:
-                cursor = conn.execute(
-                    "SELECT urlhash FROM urls WHERE urlhash = ?",
-                    (urlhash,)
-                )
-                
-                if cursor.fetchone() is None:
-                    self.logger.error(
-                        f"Completed url {url}, but have not seen it before.")
-                
-                conn.execute(
-                    "UPDATE urls SET completed = 1 WHERE urlhash = ?",
-                    (urlhash,)
-                )
-                conn.commit()
+                self._conn.execute("BEGIN IMMEDIATE")
+                if adds:
+                    self._conn.executemany(_INSERT_SQL, adds)
+                if dones:
+                    self._conn.executemany(_COMPLETE_SQL, dones)
+                self._conn.commit()
             except sqlite3.Error as e:
-                self.logger.error(f"Database error marking {url} complete: {e}")
-                conn.rollback()
-            finally:
-                conn.close()
+                self.logger.error(
+                    f"Database error writing batch of {len(batch)}: {e}")
+                try:
+                    self._conn.rollback()
+                except sqlite3.Error as e:
+                    self.logger.error(f"Database error rolling back: {e}")
+    
+    def flush(self):
+        """
+        Block until every queued database write has been committed.
+        Gives up after self._flush_timeout seconds, or at once if the
+        writer thread is gone, so shutdown can never hang on it.
+        """
+        with self._seen_lock:
+            drained, self._completed_buffer = self._completed_buffer, []
+        if drained:
+            self._write_q.put(("done", drained))
+        
+        # Queue.join() with a deadline
+        q = self._write_q
+        deadline = time.monotonic() + self._flush_timeout
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._writer.is_alive():
+                    self.logger.error(
+                        f"Gave up flushing with {q.unfinished_tasks} "
+                        f"database writes pending.")
+                    return
+                q.all_tasks_done.wait(min(remaining, 1.0))
     
     def log_final_stats(self):
         """Log final frontier statistics (call when crawl is done)."""
+        self.flush()
         stats = self.get_frontier_stats()
         self.logger.info("=" * 70)
         self.logger.info("FRONTIER FINAL STATISTICS")
@@ -0,0 +1,33 @@
+from threading import Lock
+import time
+
+# Global per-domain politeness tracking, shared by every Worker. Domains
+# map onto a fixed array of lock stripes, so looking up a domain's lock
+# needs no global mutex; _last_access_time entries are only touched under
+# their domain's stripe.
+_POLITENESS_STRIPES = 256
+_stripe_locks = [Lock() for _ in range(_POLITENESS_STRIPES)]
+_last_access_time = {}
+
+
+def wait_for_politeness(domain, delay):
+    """
+    Enforce politeness delay per domain.
+    Only one worker can access a domain at a time.
+    """
+    domain_lock = _stripe_locks[hash(domain) % _POLITENESS_STRIPES]
+    
+    # Acquire domain's stripe lock (blocks if another worker is accessing this domain)
+    with domain_lock:
+        current_time = time.time()
+        last_access = _last_access_time.get(domain, 0.0)
+        
+        # Calculate time since last access to this domain
+        time_since_last = current_time - last_access
+        
+        # If not enough time has passed, wait
+        if time_since_last < delay:
+            time.sleep(delay - time_since_last)
+        
+        # Update last access time for this domain
+        _last_access_time[domain] = time.time()
@@ -1,17 +1,19 @@
-from threading import Thread, Lock
+from threading import Thread
 from inspect import getsource
 from utils.download import download
-from utils import get_logger
+from utils import get_logger, get_domain
 from report import Report
-from urllib.parse import urlparse
+from crawler.politeness import wait_for_politeness
 import scraper
-import time
-from collections import defaultdict
 
-# Global per-domain politeness tracking
-_domain_locks = defaultdict(Lock)
-_last_access_time = defaultdict(float)
-_politeness_lock = Lock()
+# basic check for requests in scraper, done once at import rather than
+# re-reading the scraper source for every Worker
+_scraper_source = getsource(scraper)
+assert "from requests import" not in _scraper_source and "import requests" not in _scraper_source, \
+    "Do not use requests in scraper.py"
+assert "from urllib.request import" not in _scraper_source and "import urllib.request" not in _scraper_source, \
+    "Do not use urllib.request in scraper.py"
+del _scraper_source
 
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier):
@@ -20,20 +22,13 @@ class Worker(Thread):
         self.config = config
         self.frontier = frontier
         self.worker_id = worker_id
-
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, \
-            "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, \
-            "Do not use urllib.request in scraper.py"
         
         super().__init__(daemon=True)
     
     def _get_domain(self, url):
         """Extract domain from URL for politeness tracking."""
         try:
-            parsed = urlparse(url)
-            return parsed.netloc.lower()
+            return get_domain(url) or "unknown"
         except:
             return "unknown"
     
@@ -42,41 +37,18 @@ class Worker(Thread):
         Enforce politeness delay per domain.
         Only one worker can access a domain at a time.
         """
-        with _politeness_lock:
-            # Get or create lock for this domain
-            domain_lock = _domain_locks[domain]
-        
-        # Acquire domain-specific lock (blocks if another worker is accessing this domain)
-        with domain_lock:
-            current_time = time.time()
-            last_access = _last_access_time[domain]
-            
-            # Calculate time since last access to this domain
-            time_since_last = current_time - last_access
-            
-            # If not enough time has passed, wait
-            if time_since_last < self.config.time_delay:
-                wait_time = self.config.time_delay - time_since_last
-                time.sleep(wait_time)
-            
-            # Update last access time for this domain
-            _last_access_time[domain] = time.time()
+        wait_for_politeness(domain, self.config.time_delay)
     
     def run(self):
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            # Blocks briefly so new URLs are picked up as soon as they land
+            tbd_url = self.frontier.get_tbd_url(timeout=1.0)
             
             if tbd_url is None:
-                # Wait to see if other threads add URLs
-                time.sleep(5)
-                tbd_url = self.frontier.get_tbd_url()
-    
-                if tbd_url is None:
+                if self.frontier.is_done():
                     self.logger.info("Frontier is empty. Stopping Crawler.")
                     break
-    
-                # Wait for other threads to potentially add URLs
-                time.sleep(0.1)
+                # Other workers are still processing and may add URLs
                 continue
             
             try:
@@ -95,9 +67,8 @@ class Worker(Thread):
                 # Scrape URLs from the page
                 scraped_urls = scraper.scraper(tbd_url, resp, self.report)
                 
-                # Add discovered URLs to frontier
-                for scraped_url in scraped_urls:
-                    self.frontier.add_url(scraped_url)
+                # Add discovered URLs to frontier in one batch
+                self.frontier.add_urls(scraped_urls)
                 
                 # Mark as complete only after successful processing
                 self.frontier.mark_url_complete(tbd_url)
@@ -107,5 +78,7 @@ class Worker(Thread):
                 self.logger.error(f"Error processing {tbd_url}: {e}", exc_info=True)
                 # Optionally mark as complete anyway to avoid infinite retries:
                 # self.frontier.mark_url_complete(tbd_url)
+            finally:
+                self.frontier.task_done()
         
         self.logger.info(f"Worker-{self.worker_id} shutting down.")
\ No newline at end of file
@@ -1,27 +1,119 @@
 import re
 from collections import Counter, defaultdict
-from urllib.parse import urlparse, urldefrag
-from threading import RLock
-from utils import get_logger
+from functools import lru_cache
+from urllib.parse import urldefrag
+from threading import Lock, local
+from utils import get_logger, get_domain
+from utils.misra_gries import MisraGries
 from stopword import load_stopwords
 
 # Standard English stopwords list
-STOPWORDS = load_stopwords("stopwords.txt")
+STOPWORDS = frozenset(load_stopwords("stopwords.txt"))
+
+_TOKEN_RE = re.compile(r"[a-zA-Z]+")
+
+# Cap on how much a single page can contribute to one word's global count
+MAX_WORD_COUNT_PER_PAGE = 50
+
+# Counters kept per word summary; counts stay exact until a shard has seen
+# this many distinct words, after which only heavy hitters are tracked
+WORD_SUMMARY_SIZE = 50_000
+
+_UCI_SUFFIX = ".uci.edu"
+
+
+@lru_cache(maxsize=200_000)
+def _is_valid_word(word: str) -> bool:
+    """
+    Check if a word is valid for reporting.
+    Filters out garbage tokens, repetitive characters, etc.
+    Cached: word frequencies are Zipfian, so most calls are repeats.
+    """
+    # Skip if too long
+    if len(word) > 20:
+        return False
+
+    # Skip repetitive character patterns (ccc, aaaa, bbbb, abab)
+    # Check if word has very low character diversity
+    word_length = len(word)
+
+    # If 3+ chars and only 1-2 unique characters, it's likely garbage.
+    # Deleting the first char, then the first one left, tells us that
+    # without building a set of the word's characters.
+    if word_length >= 3:
+        rest = word.replace(word[0], "")
+        if not rest or not rest.replace(rest[0], ""):
+            return False
+
+    # Check for alternating patterns (abababab)
+    if word_length >= 6:
+        # Check if first half equals second half (repeated pattern)
+        half = word_length // 2
+        if word[:half] == word[half:2*half]:
+            return False
+
+    return True
+
+
+@lru_cache(maxsize=4096)
+def _uci_subdomain_of_netloc(netloc: str):
+    """Subdomain key for a netloc ending with 'uci.edu', else None."""
+    # Same hostname rules as urlparse: drop userinfo and port
+    hostname = netloc.rpartition("@")[2]
+    if hostname.startswith("["):
+        hostname = hostname[1:hostname.find("]")]
+    else:
+        hostname = hostname.partition(":")[0]
+    hostname = hostname.lower()
+
+    if hostname.endswith("uci.edu"):
+        # example: www.ics.uci.edu
+        # we want: www.ics
+        sub = hostname[: -len(_UCI_SUFFIX)]
+        if sub == "":
+            # root: uci.edu
+            sub = "(root)"
+        return sub
+    return None
+
+
+class _ReportShard:
+    """
+    One thread's slice of the report statistics.
+    Only its owning thread writes to it; the lock is uncontended except
+    while a report is being merged from another thread.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.unique_urls = set()
+        self.word_summary = MisraGries(WORD_SUMMARY_SIZE)
+        self.uci_subdomains = defaultdict(int)
+
+    def clear(self):
+        with self.lock:
+            self.unique_urls.clear()
+            self.word_summary.clear()
+            self.uci_subdomains.clear()
 
 
 class Report:
     """
     Thread-safe singleton report class for web crawler statistics.
     All workers share the same instance via class-level attributes.
+    Each thread accumulates into its own shard; shards are reduced only
+    when statistics are read.
     """
     
     # Class-level (static) attributes shared by all instances
-    _unique_urls = set()
+    _local = local()
+    # Strong references on purpose: worker threads exit before the final
+    # report is generated, and their shards must outlive them.
+    _shards = []
+    _shards_lock = Lock()
     _longest_page_url = None
     _longest_page_wordcount = 0
-    _word_counter = Counter()
-    _uci_subdomains = defaultdict(int)
-    _lock = RLock()
+    _longest_lock = Lock()
     _instance = None
     _log = None
     
@@ -35,12 +127,28 @@ class Report:
     @classmethod
     def reset(cls):
         """Reset all statistics (useful for testing or restart)."""
-        with cls._lock:
-            cls._unique_urls.clear()
+        with cls._shards_lock:
+            for shard in cls._shards:
+                shard.clear()
+        with cls._longest_lock:
             cls._longest_page_url = None
             cls._longest_page_wordcount = 0
-            cls._word_counter.clear()
-            cls._uci_subdomains.clear()
+
+    @classmethod
+    def _shard(cls):
+        """Returns the calling thread's shard, registering it on first use."""
+        shard = getattr(cls._local, "shard", None)
+        if shard is None:
+            shard = _ReportShard()
+            cls._local.shard = shard
+            with cls._shards_lock:
+                cls._shards.append(shard)
+        return shard
+
+    @classmethod
+    def _snapshot_shards(cls):
+        with cls._shards_lock:
+            return list(cls._shards)
 
     def process_page(self, url: str, text_or_words):
         """
@@ -48,113 +156,109 @@ class Report:
         Thread-safe: multiple workers can call this concurrently.
         
         - url: final URL (should be normalized, but we ensure fragment removal)
-        - text_or_words: either raw text string OR list of pre-tokenized words
+        - text_or_words: either raw text string OR a sequence of pre-tokenized
+          words (the scraper passes its token list, skipping re-tokenization)
         
         NOTE: Per assignment requirements, uniqueness is determined by URL
         WITHOUT fragment (e.g., http://example.com#a and http://example.com#b
         are considered the same page).
         """
-        with self._lock:
-            # Ensure fragment is removed (defensive programming)
-            # Even though scraper should normalize, we guarantee it here
-            url_no_fragment, _ = urldefrag(url)
-            
-            # Track unique URLs (without fragments)
-            self._unique_urls.add(url_no_fragment)
+        # Everything per-page is computed locally, then merged into this
+        # thread's shard; only a new longest page touches shared state.
 
-            # Handle both string and list inputs
-            if isinstance(text_or_words, list):
-                # Already tokenized - use directly
-                words = text_or_words
-            else:
-                # String text - tokenize it
-                words = self._tokenize(text_or_words)
+        # Ensure fragment is removed (defensive programming)
+        # Even though scraper should normalize, we guarantee it here
+        url_no_fragment, _ = urldefrag(url)
 
-            # Count words in this page
-            word_count = len(words)
+        # Handle both string and pre-tokenized inputs
+        if isinstance(text_or_words, str):
+            # String text - tokenize it
+            words = self._tokenize(text_or_words)
+        else:
+            # Already tokenized (list/tuple) - use directly
+            words = text_or_words
 
-            # Check if this is the longest page
-            if word_count > self._longest_page_wordcount:
-                self._longest_page_wordcount = word_count
-                self._longest_page_url = url_no_fragment
+        # Count words in this page
+        word_count = len(words)
 
-            # Count global word frequencies (with filtering)
-            valid_words = [w for w in words if self._is_valid_word(w)]
+        # Count page word frequencies; counting first means the validity
+        # filter runs once per distinct word rather than once per token
+        word_freq_this_page = Counter(words)
 
-            # Per-page word frequency limiting
-            from collections import Counter
-            word_freq_this_page = Counter(valid_words)
+        # Per-page word frequency limiting (with filtering)
+        cap = MAX_WORD_COUNT_PER_PAGE
+        capped_freq = {word: count if count < cap else cap
+                       for word, count in word_freq_this_page.items()
+                       if _is_valid_word(word)}
 
-            MAX_WORD_COUNT_PER_PAGE = 50
+        # Check subdomain stats for uci.edu
+        subdomain = self._uci_subdomain(url_no_fragment)
 
-            for word, count in word_freq_this_page.items():
-                capped_count = min(count, MAX_WORD_COUNT_PER_PAGE)
-                self._word_counter[word] += capped_count
+        shard = self._shard()
+        with shard.lock:
+            # Track unique URLs (without fragments)
+            shard.unique_urls.add(url_no_fragment)
 
-            # Check subdomain stats for uci.edu
-            self._track_uci_subdomain(url_no_fragment)
+            # One merge over the page's unique words
+            shard.word_summary.update(capped_freq)
 
+            if subdomain is not None:
+                shard.uci_subdomains[subdomain] += 1
 
+        # Check if this is the longest page; the unlocked read is only a
+        # filter, the comparison is repeated under the lock.
+        cls = type(self)
+        if word_count > cls._longest_page_wordcount:
+            with cls._longest_lock:
+                if word_count > cls._longest_page_wordcount:
+                    cls._longest_page_wordcount = word_count
+                    cls._longest_page_url = url_no_fragment
 
     def _tokenize(self, text: str):
         """Tokenizes text, removes stopwords, returns lowercase words."""
-        tokens = re.findall(r"[a-zA-Z]+", text.lower())
-        return [t for t in tokens if t not in STOPWORDS]
+        # Lowercase each short token rather than copying the whole text
+        stopwords = STOPWORDS
+        return [w for w in map(str.lower, _TOKEN_RE.findall(text))
+                if w not in stopwords]
     
-    def _is_valid_word(self, word: str) -> bool:
-        """
-        Check if a word is valid for reporting.
-        Filters out garbage tokens, repetitive characters, etc.
-        """
-        # Skip if too long
-        if len(word) > 20:
-            return False
-        
-        # Skip repetitive character patterns (ccc, aaaa, bbbb, abab)
-        # Check if word has very low character diversity
-        unique_chars = len(set(word))
-        word_length = len(word)
-        
-        # If 3+ chars and only 1-2 unique characters, it's likely garbage
-        if word_length >= 3 and unique_chars <= 2:
-            return False
-        
-        # Check for alternating patterns (abababab)
-        if word_length >= 6:
-            # Check if first half equals second half (repeated pattern)
-            half = word_length // 2
-            if word[:half] == word[half:2*half]:
-                return False
-        
-        return True
-
-    def _track_uci_subdomain(self, url: str):
-        """Counts subdomain if domain ends with 'uci.edu'."""
-        parsed = urlparse(url)
-        hostname = parsed.hostname or ""
-
-        if hostname.endswith("uci.edu"):
-            # example: www.ics.uci.edu
-            # we want: www.ics
-            sub = hostname[: -len(".uci.edu")]
-            if sub == "":
-                # root: uci.edu
-                sub = "(root)"
-            self._uci_subdomains[sub] += 1
+    def _uci_subdomain(self, url: str):
+        """Returns the subdomain key if domain ends with 'uci.edu', else None."""
+        # Cached per netloc: a crawl sees the same few hosts over and over
+        return _uci_subdomain_of_netloc(get_domain(url))
 
     # ---- Final Output Methods ----
 
+    def _merged_unique_urls(self):
+        urls = set()
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                urls |= shard.unique_urls
+        return urls
+
+    def _merged_word_summary(self):
+        summary = MisraGries(WORD_SUMMARY_SIZE)
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                summary.merge(shard.word_summary)
+        return summary
+
+    def _merged_uci_subdomains(self):
+        subdomains = Counter()
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                subdomains.update(shard.uci_subdomains)
+        return subdomains
+
     def get_unique_page_count(self):
         """
         Thread-safe getter for unique page count.
         Returns count of unique URLs (fragments ignored per assignment).
         """
-        with self._lock:
-            return len(self._unique_urls)
+        return len(self._merged_unique_urls())
 
     def get_longest_page(self):
         """Thread-safe getter for longest page info."""
-        with self._lock:
+        with self._longest_lock:
             return self._longest_page_url, self._longest_page_wordcount
 
     def get_top_50_words(self):
@@ -162,38 +266,40 @@ class Report:
         Thread-safe getter for top 50 words.
         Returns list of (word, count) tuples.
         """
-        with self._lock:
-            return self._word_counter.most_common(50)
+        return self._merged_word_summary().most_common(50)
 
     def get_uci_subdomain_stats(self):
         """
         Returns list of (subdomain, count), alphabetically sorted.
         Thread-safe.
         """
-        with self._lock:
-            return sorted(self._uci_subdomains.items(), key=lambda x: x[0])
+        return sorted(self._merged_uci_subdomains().items(), key=lambda x: x[0])
 
     def generate_report(self):
         """
         Logs the complete report.
         Thread-safe: can be called from any thread.
         """
-        with self._lock:
-            self._log.info("=" * 70)
-            self._log.info("CRAWLER REPORT")
-            self._log.info("=" * 70)
-            
-            self._log.info(f"Total unique pages: {len(self._unique_urls)}")
-            self._log.info(f"  (Uniqueness determined by URL without fragment)")
-            self._log.info(f"Longest page: {self._longest_page_url} "
-                          f"({self._longest_page_wordcount} words)")
-
-            self._log.info("\nTop 50 words:")
-            for word, freq in self._word_counter.most_common(50):
-                self._log.info(f"  {word}: {freq}")
-
-            self._log.info("\nUCI subdomains:")
-            for sub, count in sorted(self._uci_subdomains.items(), key=lambda x: x[0]):
-                self._log.info(f"  {sub}.uci.edu: {count} pages")
-            
-            self._log.info("=" * 70)
\ No newline at end of file
+        unique_count = self.get_unique_page_count()
+        longest_url, longest_wordcount = self.get_longest_page()
+        top_words = self.get_top_50_words()
+        subdomains = self.get_uci_subdomain_stats()
+
+        self._log.info("=" * 70)
+        self._log.info("CRAWLER REPORT")
+        self._log.info("=" * 70)
+        
+        self._log.info(f"Total unique pages: {unique_count}")
+        self._log.info(f"  (Uniqueness determined by URL without fragment)")
+        self._log.info(f"Longest page: {longest_url} "
+                      f"({longest_wordcount} words)")
+
+        self._log.info("\nTop 50 words:")
+        for word, freq in top_words:
+            self._log.info(f"  {word}: {freq}")
+
+        self._log.info("\nUCI subdomains:")
+        for sub, count in subdomains:
+            self._log.info(f"  {sub}.uci.edu: {count} pages")
+        
+        self._log.info("=" * 70)
\ No newline at end of file
@@ -6,19 +6,23 @@ import re
 import hashlib
 import time
 import os
-from threading import Lock
+import pickle
+import struct
+import atexit
+from threading import Event, Lock
 from urllib.parse import (
     urlparse,
     urljoin,
     urldefrag,
-    parse_qs,
-    parse_qsl,
     urlunparse,
+    ParseResult,
 )
-from collections import defaultdict, deque
-from bs4 import BeautifulSoup
+from collections import Counter, OrderedDict
+from functools import lru_cache
+import lxml.etree
+import lxml.html
 from urllib.robotparser import RobotFileParser
-from trap import is_trap
+from trap import is_trap_parsed
 
 # ----------------------------
 # Configurable limits / params
@@ -28,6 +32,7 @@ MAX_CHECKSUM_CACHE = 200_000
 SIMHASH_EVICT_BATCH = 10_000
 CHECKSUM_EVICT_BATCH = 10_000
 MAX_ROBOTS_CACHE_AGE = 24 * 3600  # 24 hours
+ROBOTS_CACHE_FILE = "robots_cache.pkl"  # robots cache persisted across runs
 
 # Min content thresholds
 MIN_CHARS = 75  # Increased from 60
@@ -36,23 +41,64 @@ MIN_TOKENS = 25  # Increased from 15
 # Simhash Hamming distance threshold
 SIMHASH_THRESHOLD = 3  # Allow small differences
 
+# LSH banding for near-duplicate lookup. With more bands than
+# SIMHASH_THRESHOLD, any hash within the threshold agrees with a stored one
+# on at least one whole band, so only that band's bucket needs checking.
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = 64 // SIMHASH_BANDS
+
+# Precompiled patterns (skip the re module's per-call pattern cache lookup)
+# Whole letter runs of 3-50 chars; the lookarounds drop longer runs outright
+# instead of splitting them into 50-char pieces
+_TOKEN_RE = re.compile(r"(?<![a-z])[a-z]{3,50}(?![a-z])")
+_DUPSLASH_RE = re.compile(r"/{2,}")
+_CONTENT_CLASS_RE = re.compile(r"(content|main|body|post|article)", re.I)
+_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+
+# Every anchor's href as plain str, collected in one C-level pass over the tree
+_HREF_XPATH = lxml.etree.XPath("//a/@href", smart_strings=False)
+
+# Tags whose contents never count as visible page text
+_NOISE_TAGS = ("script", "style", "noscript", "iframe", "object", "embed", "svg", "canvas", "meta", "link")
+_NOISE_TAG_SET = frozenset(_NOISE_TAGS)
+
+# Simhash lane layout: each of the 64 hash bits gets its own 32-bit counter
+# lane inside one big Python int, so a token's contribution to all 64
+# counters is a single multiply-add instead of a 64-step bit loop.
+# _SIMHASH_SPREAD[k][b] has 1 in the lane of every set bit of byte value b
+# sitting at byte position k (bit 8*k + j of the hash).
+_SIMHASH_LANE = 32
+# Lane patterns of recently seen tokens (each ~256 bytes); common
+# vocabulary repeats across pages, so most tokens skip hashing entirely
+SIMHASH_TOKEN_CACHE = 32_768
+_SIMHASH_LANES = struct.Struct("<64I")
+_SIMHASH_SPREAD = [
+    [
+        sum(1 << (_SIMHASH_LANE * (8 * k + j)) for j in range(8) if (b >> j) & 1)
+        for b in range(256)
+    ]
+    for k in range(8)
+]
+
 # ----------------------------
 # Global thread-safe caches
 # ----------------------------
-_cache_lock = Lock()
-
-_seen_simhashes = deque(maxlen=MAX_SIMHASH_CACHE)  # Auto-bounded
-_seen_simhash_set = set()
+_cache_lock = Lock()  # robots cache
 
-_seen_checksums = deque(maxlen=MAX_CHECKSUM_CACHE)  # Auto-bounded
-_seen_checksum_set = set()
+# Insertion-ordered keys give O(1) lookup plus FIFO eviction via popitem()
+_simhash_lock = Lock()
+_seen_simhashes = OrderedDict()
+_simhash_bands = [dict() for _ in range(SIMHASH_BANDS)]  # band value -> [simhash]
 
-_robots_cache = {}
-_robots_cache_time = {}
+# Exact-match checksums shard cleanly on the digest's low bits, so each
+# shard gets its own lock and FIFO; near-duplicate simhashes can differ in
+# any bit, so they stay in one table behind _simhash_lock
+CHECKSUM_SHARDS = 16
+_checksum_locks = [Lock() for _ in range(CHECKSUM_SHARDS)]
+_seen_checksums = [OrderedDict() for _ in range(CHECKSUM_SHARDS)]
 
-_calendar_counter = defaultdict(int)
-_repetition_counter = defaultdict(int)
-_path_query_counter = defaultdict(lambda: defaultdict(int))  # Simple counter
+_robots_cache = {}  # domain_base -> (RobotFileParser or None, fetched_at)
+_robots_fetching = {}  # domain_base -> Event set once its robots.txt is cached
 
 # Load stopwords (optional)
 STOPWORDS = set()
@@ -63,20 +109,76 @@ try:
 except Exception:
     pass
 
+# Reload robots.txt rules fetched by earlier runs; stale entries are
+# refetched on first use, and the cache is written back at exit
+try:
+    if os.path.exists(ROBOTS_CACHE_FILE):
+        with open(ROBOTS_CACHE_FILE, "rb") as f:
+            _robots_cache.update(pickle.load(f))
+except Exception:
+    pass
+
+
+def _save_robots_cache():
+    try:
+        with _cache_lock:
+            snapshot = dict(_robots_cache)
+        with open(ROBOTS_CACHE_FILE, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        pass
+
+atexit.register(_save_robots_cache)
+
 # ----------------------------
 # Helper: bounded cache utilities
 # ----------------------------
-def _evict_if_needed():
-    """Sync sets with deques when deque auto-evicts."""
-    with _cache_lock:
-        # Deques auto-evict, so we rebuild sets from current deque contents
-        if len(_seen_simhash_set) > len(_seen_simhashes) * 1.2:
-            _seen_simhash_set.clear()
-            _seen_simhash_set.update(_seen_simhashes)
-        
-        if len(_seen_checksum_set) > len(_seen_checksums) * 1.2:
-            _seen_checksum_set.clear()
-            _seen_checksum_set.update(_seen_checksums)
+def _checksum_shard(checksum):
+    return checksum[0] & (CHECKSUM_SHARDS - 1)
+
+
+def _seen_checksum(checksum):
+    i = _checksum_shard(checksum)
+    with _checksum_locks[i]:
+        return checksum in _seen_checksums[i]
+
+
+def _add_checksum(checksum):
+    """Remember checksum, evicting its shard's oldest when the shard is full."""
+    i = _checksum_shard(checksum)
+    with _checksum_locks[i]:
+        seen = _seen_checksums[i]
+        seen[checksum] = None
+        if len(seen) > MAX_CHECKSUM_CACHE // CHECKSUM_SHARDS:
+            seen.popitem(last=False)
+
+
+def _simhash_band_keys(simhash):
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [(simhash >> (SIMHASH_BAND_BITS * b)) & mask for b in range(SIMHASH_BANDS)]
+
+
+def _is_near_duplicate(simhash):
+    """Check simhash against stored hashes sharing a band. Caller holds _simhash_lock."""
+    for table, key in zip(_simhash_bands, _simhash_band_keys(simhash)):
+        for old_simhash in table.get(key, ()):
+            if hamming_distance(simhash, old_simhash) <= SIMHASH_THRESHOLD:
+                return True
+    return False
+
+
+def _add_simhash(simhash):
+    """Index simhash in every band, evicting the oldest when full. Caller holds _simhash_lock."""
+    _seen_simhashes[simhash] = None
+    if len(_seen_simhashes) > MAX_SIMHASH_CACHE:
+        oldest, _ = _seen_simhashes.popitem(last=False)
+        for table, key in zip(_simhash_bands, _simhash_band_keys(oldest)):
+            bucket = table[key]
+            bucket.remove(oldest)
+            if not bucket:
+                del table[key]
+    for table, key in zip(_simhash_bands, _simhash_band_keys(simhash)):
+        table.setdefault(key, []).append(simhash)
 
 # ----------------------------
 # Main scraper entrypoint
@@ -105,14 +207,25 @@ def scraper(url, resp, report):
             # Block non-HTML types
             return []
 
-    # try to extract text
+    # parse once; the tree is shared by link and text extraction
     try:
         raw = resp.raw_response.content
         # Binary check
         if b"\x00" in raw[:8192]:
             return []
 
-        text = extract_visible_text(raw)
+        tree = lxml.html.document_fromstring(raw, parser=_html_parser(content_type, raw))
+    except Exception:
+        return []
+
+    try:
+        raw_links = extract_next_links(getattr(resp, "url", url), tree)
+    except Exception:
+        raw_links = []
+
+    # try to extract text
+    try:
+        text = extract_visible_text(tree)
     except Exception:
         return []
 
@@ -124,58 +237,53 @@ def scraper(url, resp, report):
         return []
 
     # Duplicate detection with near-duplicate checking
-    checksum = compute_checksum(text)
+    checksum = compute_checksum(tokens)
     simhash = compute_simhash(tokens)
 
-    with _cache_lock:
-        _evict_if_needed()
-
-        # Exact duplicate check
-        if checksum in _seen_checksum_set:
-            return []
+    # Exact duplicate check
+    if _seen_checksum(checksum):
+        return []
 
-        # Near-duplicate check: Hamming distance on recent simhashes
-        # Check last 1000 only to keep it fast
-        if simhash in _seen_simhash_set:
+    # Near-duplicate check: Hamming distance against every retained
+    # simhash that shares a band with this one. Check and insert happen
+    # under one lock, so of two concurrent copies of a page only the first
+    # gets through.
+    with _simhash_lock:
+        if _is_near_duplicate(simhash):
             return []
-        
-        # Check Hamming distance against recent entries (bounded check)
-        recent_count = min(1000, len(_seen_simhashes))
-        for i in range(recent_count):
-            try:
-                old_simhash = _seen_simhashes[-(i+1)]
-                if hamming_distance(simhash, old_simhash) <= SIMHASH_THRESHOLD:
-                    return []
-            except IndexError:
-                break
+        _add_simhash(simhash)
 
-        # Register both
-        _seen_checksums.append(checksum)
-        _seen_checksum_set.add(checksum)
+    _add_checksum(checksum)
 
-        _seen_simhashes.append(simhash)
-        _seen_simhash_set.add(simhash)
-
-    # record page into report
+    # record page into report; handing over the token list lets the
+    # report skip its own regex pass over the page text
     try:
         report.process_page(url, tokens)
     except Exception:
         pass
 
-    # extract links and normalize
-    try:
-        raw_links = extract_next_links(url, resp)
-    except Exception:
-        raw_links = []
-
+    # normalize extracted links; each link is parsed once and the
+    # normalized parts go straight to the validity and trap checks.
+    # Repeats (nav menus, footers) are skipped before and after normalizing,
+    # so each URL is checked once and bumps the trap counters only once.
     out_links = []
+    seen_links = set()
+    seen_normalized = set()
     for link in raw_links:
-        normalized = normalize_url(link)
-        if not normalized:
+        if link in seen_links:
+            continue
+        seen_links.add(link)
+        try:
+            parsed = _normalize_parsed(urlparse(link))
+        except Exception:
+            continue
+        normalized = urlunparse(parsed)
+        if normalized in seen_normalized:
             continue
-        if not is_valid(normalized):
+        seen_normalized.add(normalized)
+        if not _is_valid_parsed(parsed):
             continue
-        if is_trap(normalized):
+        if is_trap_parsed(normalized, parsed):
             continue
         out_links.append(normalized)
 
@@ -189,72 +297,82 @@ def normalize_url(url):
     Normalize URL to canonical form with proper trailing slash handling.
     """
     try:
-        url, _ = urldefrag(url)
-        parsed = urlparse(url)
-
-        scheme = parsed.scheme.lower() or "http"
-        netloc = parsed.netloc.lower()
-        path = parsed.path or ""
-
-        # Remove duplicate slashes
-        if path:
-            path = re.sub(r"/{2,}", "/", path)
-
-        # Normalize empty path to "/"
-        if not path:
-            path = "/"
-
-        # Trailing slash normalization
-        # Add trailing slash for directories (no extension), remove for files
-        if path != "/":
-            last_segment = path.split("/")[-1]
-            has_extension = "." in last_segment and not last_segment.startswith(".")
-            
-            if has_extension:
-                # File: remove trailing slash
-                path = path.rstrip("/")
-            else:
-                # Directory: ensure trailing slash
-                if not path.endswith("/"):
-                    path = path + "/"
-
-        # Sort query parameters
-        query = parsed.query or ""
-        if query:
-            pairs = parse_qsl(query, keep_blank_values=True)
-            pairs.sort(key=lambda kv: (kv[0], kv[1]))
-            query = "&".join(f"{k}={v}" for k, v in pairs)
-
-        normalized = urlunparse((scheme, netloc, path, "", query, ""))
-        return normalized
+        return urlunparse(_normalize_parsed(urlparse(url)))
     except Exception:
         return None
 
 
+def _normalize_parsed(parsed):
+    """Canonical ParseResult for an already-parsed URL; the fragment is dropped."""
+    scheme = parsed.scheme.lower() or "http"
+    netloc = parsed.netloc.lower()
+    path = parsed.path or ""
+
+    # Remove duplicate slashes
+    if path:
+        path = _DUPSLASH_RE.sub("/", path)
+
+    # Normalize empty path to "/"
+    if not path:
+        path = "/"
+
+    # Trailing slash normalization
+    # Add trailing slash for directories (no extension), remove for files
+    if path != "/":
+        # Last segment has a dot, and isn't a dotfile like ".htaccess"
+        slash = path.rfind("/")
+        has_extension = path.rfind(".") > slash and path[slash + 1] != "."
+        
+        if has_extension:
+            # File: remove trailing slash
+            path = path.rstrip("/")
+        else:
+            # Directory: ensure trailing slash
+            if not path.endswith("/"):
+                path = path + "/"
+
+    # Sort query parameters (raw "k=v" strings, left percent-encoded)
+    query = parsed.query or ""
+    if query:
+        query = "&".join(sorted(p for p in query.split("&") if p))
+
+    return ParseResult(scheme, netloc, path, "", query, "")
+
+
 # ----------------------------
-# Link extraction
+# Parsing + link extraction
 # ----------------------------
-def extract_next_links(base_url, resp):
-    """Return absolute links found on page."""
-    if resp is None or getattr(resp, "raw_response", None) is None:
-        return []
-
+def _html_parser(content_type, raw):
+    """
+    HTML parser decoding raw with the charset from the Content-Type header.
+    Without one, a <meta charset> near the top is left to libxml2, and
+    anything else is read as UTF-8 (libxml2 alone would assume Latin-1).
+    """
+    match = _CHARSET_RE.search(content_type)
+    if match:
+        encoding = match.group(1)
+    elif _CHARSET_RE.search(raw[:2048].decode("ascii", "ignore")):
+        encoding = None
+    else:
+        encoding = "utf-8"
+    # A new parser per page: lxml parsers must not be shared across threads
     try:
-        soup = BeautifulSoup(resp.raw_response.content, "html.parser")
-    except Exception:
-        return []
+        return lxml.html.HTMLParser(encoding=encoding)
+    except LookupError:
+        return lxml.html.HTMLParser(encoding="utf-8")
 
-    actual_url = getattr(resp, "url", base_url)
-    
+
+def extract_next_links(base_url, tree):
+    """Return absolute links found in the parsed page, resolved against base_url."""
     out = []
-    for tag in soup.find_all("a", href=True):
-        href = tag.get("href", "").strip()
+    for href in _HREF_XPATH(tree):
+        href = href.strip()
         if not href:
             continue
         if href.startswith(("javascript:", "mailto:", "tel:", "data:", "#")):
             continue
         try:
-            abs_url = urljoin(actual_url, href)
+            abs_url = urljoin(base_url, href)
             abs_url, _ = urldefrag(abs_url)
             out.append(abs_url)
         except Exception:
@@ -264,45 +382,88 @@ def extract_next_links(base_url, resp):
 # ----------------------------
 # Text extraction + tokenization
 # ----------------------------
-def extract_visible_text(content_bytes):
-    """Return cleaned, main visible text from HTML bytes."""
-    soup = BeautifulSoup(content_bytes, "html.parser")
-
-    # Remove noise
-    for tag in soup(["script", "style", "noscript", "iframe", "object", "embed", "svg", "canvas", "meta", "link"]):
-        tag.decompose()
-
-    # Prefer main content
-    main_content = (
-        soup.find("main")
-        or soup.find("article")
-        or soup.find("div", class_=re.compile(r"(content|main|body|post|article)", re.I))
-        or soup.find("body")
-        or soup
-    )
+def _outside_noise(el):
+    return next(el.iterancestors(_NOISE_TAGS), None) is None
 
-    text = main_content.get_text(separator=" ", strip=True)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+
+def _first_visible(tree, tag, match=None):
+    """First tag element (optionally passing match) not inside a noise tag."""
+    for el in tree.iter(tag):
+        if (match is None or match(el)) and _outside_noise(el):
+            return el
+    return None
+
+
+def _has_content_class(div):
+    return _CONTENT_CLASS_RE.search(div.get("class") or "") is not None
+
+
+def _visible_text_parts(root):
+    """
+    Text and tail strings under root in document order, skipping the
+    contents of noise tags and comments (their tails still count).
+    Walks the tree without modifying it.
+    """
+    parts = []
+    if root.text:
+        parts.append(root.text)
+    noise = _NOISE_TAG_SET
+    # (remaining children, tail to emit once they are done)
+    stack = [(iter(root), None)]
+    while stack:
+        children, tail = stack[-1]
+        for child in children:
+            tag = child.tag
+            if isinstance(tag, str) and tag not in noise:
+                if child.text:
+                    parts.append(child.text)
+                stack.append((iter(child), child.tail))
+                break
+            if child.tail:
+                parts.append(child.tail)
+        else:
+            stack.pop()
+            if tail:
+                parts.append(tail)
+    return parts
+
+
+def extract_visible_text(tree):
+    """Return cleaned, main visible text from a parsed page."""
+    # Prefer main content, ignoring candidates hidden inside noise tags
+    main_content = _first_visible(tree, "main")
+    if main_content is None:
+        main_content = _first_visible(tree, "article")
+    if main_content is None:
+        main_content = _first_visible(tree, "div", _has_content_class)
+    if main_content is None:
+        main_content = tree.find("body")
+    if main_content is None:
+        main_content = tree
+
+    # str.split() drops the same Unicode whitespace runs \s+ would, and
+    # rejoining its words collapses and strips in one C pass
+    return " ".join(" ".join(_visible_text_parts(main_content)).split())
 
 
 def tokenize(text):
     """Tokenize and filter stopwords."""
-    tokens = re.findall(r"[a-zA-Z]+", text.lower())
-    out = []
-    for t in tokens:
-        if len(t) <= 2:
-            continue
-        if t in STOPWORDS:
-            continue
-        if len(t) > 50:
-            continue
-        out.append(t)
-    return out
+    stopwords = STOPWORDS
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in stopwords]
 
 # ----------------------------
 # Robots.txt handling - FIXED
 # ----------------------------
+def _fetch_robots(domain_base):
+    """Fetch and parse robots.txt for domain_base; None if the fetch failed."""
+    try:
+        rp = RobotFileParser()
+        rp.set_url(domain_base + "/robots.txt")
+        rp.read()
+        return rp
+    except Exception:
+        return None
+
 def robots_allowed(url):
     """
     Return True if allowed by robots.txt.
@@ -312,30 +473,39 @@ def robots_allowed(url):
         domain_base = parsed.scheme + "://" + parsed.netloc
 
         current = time.time()
-        with _cache_lock:
-            # Check if cached and not expired
-            if domain_base in _robots_cache:
-                age = current - _robots_cache_time.get(domain_base, 0)
-                if age > MAX_ROBOTS_CACHE_AGE:
-                    # Expired, remove
-                    del _robots_cache[domain_base]
-                    del _robots_cache_time[domain_base]
-
-            # Fetch if not cached
-            if domain_base not in _robots_cache:
-                rp = RobotFileParser()
-                rp.set_url(domain_base + "/robots.txt")
-                try:
-                    rp.read()
-                    _robots_cache[domain_base] = rp
-                except Exception:
-                    # Failed - cache None and mark as fetched
-                    _robots_cache[domain_base] = None
-                
-                # Always set cache time on first fetch
-                _robots_cache_time[domain_base] = current
-
-            rp = _robots_cache[domain_base]
+        # Fast path: a single dict read is atomic, so a fresh entry needs
+        # no lock; (parser, fetched_at) is replaced whole, never mutated
+        entry = _robots_cache.get(domain_base)
+        cached = entry is not None and current - entry[1] <= MAX_ROBOTS_CACHE_AGE
+        if cached:
+            rp = entry[0]
+        else:
+            with _cache_lock:
+                # Check if cached and not expired
+                entry = _robots_cache.get(domain_base)
+                cached = entry is not None and current - entry[1] <= MAX_ROBOTS_CACHE_AGE
+                if cached:
+                    rp = entry[0]
+                else:
+                    # Only one worker fetches a given host; others wait on its Event
+                    fetching = _robots_fetching.get(domain_base)
+                    fetcher = fetching is None
+                    if fetcher:
+                        fetching = _robots_fetching[domain_base] = Event()
+
+        # Fetch if not cached, without holding the lock over network I/O
+        if not cached:
+            if fetcher:
+                rp = _fetch_robots(domain_base)
+                with _cache_lock:
+                    # Expired entries are simply overwritten
+                    _robots_cache[domain_base] = (rp, current)
+                    del _robots_fetching[domain_base]
+                fetching.set()
+            else:
+                fetching.wait()
+                entry = _robots_cache.get(domain_base)
+                rp = entry[0] if entry is not None else None
 
         # If None (fetch failed), allow crawling
         if rp is None:
@@ -349,10 +519,24 @@ def robots_allowed(url):
 # ----------------------------
 # Duplicate detection
 # ----------------------------
-def compute_checksum(text):
-    """Normalized MD5 checksum for exact-duplicate detection."""
-    normalized = re.sub(r"\s+", " ", text.lower().strip())
-    return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+def compute_checksum(tokens):
+    """
+    Checksum for exact-duplicate detection, taken over the page's tokens,
+    which are already lowercased and stripped of punctuation.
+    """
+    return hashlib.blake2b(" ".join(tokens).encode("utf-8"), digest_size=8).digest()
+
+
+@lru_cache(maxsize=SIMHASH_TOKEN_CACHE)
+def _token_spread(token):
+    """Lane pattern (see _SIMHASH_SPREAD) of token's 64-bit hash."""
+    # Cheap 64-bit mixer; read big-endian, so h[0] is the top byte
+    h = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    spread = _SIMHASH_SPREAD
+    return (
+        spread[7][h[0]] + spread[6][h[1]] + spread[5][h[2]] + spread[4][h[3]]
+        + spread[3][h[4]] + spread[2][h[5]] + spread[1][h[6]] + spread[0][h[7]]
+    )
 
 
 def compute_simhash(tokens):
@@ -362,36 +546,64 @@ def compute_simhash(tokens):
     if not tokens:
         return 0
 
-    v = [0] * 64
-    freq = defaultdict(int)
-    for t in tokens:
-        freq[t] += 1
-
-    for token, count in freq.items():
-        h = hashlib.sha256(token.encode("utf-8")).digest()
-        hv = int.from_bytes(h[:8], "big")
-        for i in range(64):
-            bit = (hv >> i) & 1
-            v[i] += count if bit else -count
+    # acc lane i = total count of tokens whose hash has bit i set
+    token_spread = _token_spread
+    acc = 0
+    for token, count in Counter(tokens).items():
+        acc += count * token_spread(token)
 
+    # Bit i is set when its +count votes outweigh the -count ones
+    total = len(tokens)
     result = 0
-    for i in range(64):
-        if v[i] > 0:
-            result |= (1 << i)
+    for i, ones in enumerate(_SIMHASH_LANES.unpack(acc.to_bytes(256, "little"))):
+        if 2 * ones > total:
+            result |= 1 << i
     return result
 
 
-def hamming_distance(x, y):
-    """Calculate Hamming distance between two integers."""
-    return bin(x ^ y).count('1')
+if hasattr(int, "bit_count"):  # Python 3.10+
+    def hamming_distance(x, y):
+        """Calculate Hamming distance between two integers."""
+        return (x ^ y).bit_count()
+else:
+    def hamming_distance(x, y):
+        """Calculate Hamming distance between two integers."""
+        return bin(x ^ y).count('1')
 
 # ----------------------------
 # URL validity filter
 # ----------------------------
+_ALLOWED_DOMAINS = frozenset({
+    "ics.uci.edu",
+    "cs.uci.edu",
+    "informatics.uci.edu",
+    "stat.uci.edu",
+})
+_ALLOWED_SUFFIXES = tuple("." + d for d in _ALLOWED_DOMAINS)
+
+_BLOCKED_EXTS = frozenset({
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico", "png", "tif", "tiff",
+    "mid", "mp2", "mp3", "mp4", "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv",
+    "ogg", "ogv", "pdf", "ps", "eps", "tex", "ppt", "pptx", "doc", "docx",
+    "xls", "xlsx", "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z",
+    "psd", "dmg", "iso", "epub", "dll", "cnf", "tgz", "sha1", "thmx", "mso",
+    "arff", "rtf", "jar", "csv", "rm", "smil", "wmv", "swf", "wma", "zip", "rar",
+    "gz", "mpg", "flv", "webm", "ttf", "otf", "woff", "woff2", "eot", "sql", "db",
+    "sqlite", "mdb", "log", "bak", "tmp", "temp", "cache", "class", "pyc", "o", "so"
+})
+
+
 def is_valid(url):
     """Return True if URL is valid and in allowed domains."""
     try:
-        parsed = urlparse(url)
+        return _is_valid_parsed(urlparse(url))
+    except Exception:
+        return False
+
+
+def _is_valid_parsed(parsed):
+    """is_valid for an already-parsed URL."""
+    try:
         scheme = parsed.scheme.lower()
         if scheme not in {"http", "https"}:
             return False
@@ -401,35 +613,16 @@ def is_valid(url):
             return False
         hostname = hostname.lower()
 
-        # Allowed domains
-        allowed_domains = {
-            "ics.uci.edu",
-            "cs.uci.edu",
-            "informatics.uci.edu",
-            "stat.uci.edu",
-        }
-
         # Check domain
-        if hostname not in allowed_domains:
-            if not any(hostname.endswith("." + d) for d in allowed_domains):
+        if hostname not in _ALLOWED_DOMAINS:
+            if not hostname.endswith(_ALLOWED_SUFFIXES):
                 return False
 
-        # Check extensions
+        # Check extensions (of the last path segment only)
         path = parsed.path or ""
-        last_segment = path.split("/")[-1].lower()
-        if "." in last_segment:
-            ext = last_segment.split(".")[-1]
-            blocked = {
-                "css", "js", "bmp", "gif", "jpg", "jpeg", "ico", "png", "tif", "tiff",
-                "mid", "mp2", "mp3", "mp4", "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv",
-                "ogg", "ogv", "pdf", "ps", "eps", "tex", "ppt", "pptx", "doc", "docx",
-                "xls", "xlsx", "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z",
-                "psd", "dmg", "iso", "epub", "dll", "cnf", "tgz", "sha1", "thmx", "mso",
-                "arff", "rtf", "jar", "csv", "rm", "smil", "wmv", "swf", "wma", "zip", "rar",
-                "gz", "mpg", "flv", "webm", "ttf", "otf", "woff", "woff2", "eot", "sql", "db",
-                "sqlite", "mdb", "log", "bak", "tmp", "temp", "cache", "class", "pyc", "o", "so"
-            }
-            if ext in blocked:
+        dot = path.rfind(".")
+        if dot > path.rfind("/"):
+            if path[dot + 1:].lower() in _BLOCKED_EXTS:
                 return False
 
         return True
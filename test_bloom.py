@@ -0,0 +1,53 @@
+import unittest
+from utils.bloom import BloomFilter, ScalableBloomFilter
+
+class BloomFilterTests(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 1e-3)
+        keys = [f"http://ics.uci.edu/{n}" for n in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertEqual(bloom.count, 1000)
+
+    def test_str_and_bytes_keys_agree(self):
+        bloom = BloomFilter(100, 1e-3)
+        bloom.add("ics.uci.edu")
+        self.assertIn(b"ics.uci.edu", bloom)
+
+class ScalableBloomFilterTests(unittest.TestCase):
+
+    def test_no_false_negatives_after_growth(self):
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=1e-3)
+        keys = [f"http://ics.uci.edu/{n}".encode() for n in range(5000)]
+        for key in keys:
+            bloom.add(key)
+        # 1000 + 2000 + 4000 capacity across three chained filters
+        self.assertEqual(len(bloom.filters), 3)
+        self.assertEqual(len(bloom), 5000)
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_chained_filters_tighten_error_rate(self):
+        bloom = ScalableBloomFilter(initial_capacity=100, error_rate=1e-3)
+        for n in range(1500):
+            bloom.add(f"/page/{n}")
+        filters = bloom.filters
+        self.assertEqual(len(filters), 4)
+        self.assertAlmostEqual(filters[0].error_rate, 1e-3 * (1.0 - bloom.TIGHTENING_RATIO))
+        for prev, cur in zip(filters, filters[1:]):
+            self.assertEqual(cur.capacity, prev.capacity * bloom.GROWTH)
+            self.assertAlmostEqual(cur.error_rate, prev.error_rate * bloom.TIGHTENING_RATIO)
+            self.assertGreater(cur.num_bits / cur.capacity, prev.num_bits / prev.capacity)
+        # Per-filter rates form a geometric series that stays under the target
+        self.assertLess(sum(f.error_rate for f in filters), bloom.error_rate)
+
+    def test_false_positive_rate(self):
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=1e-2)
+        for n in range(5000):
+            bloom.add(f"seen/{n}")
+        false_positives = sum(f"unseen/{n}" in bloom for n in range(20000))
+        self.assertLess(false_positives, 20000 * 1e-2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import random
+import unittest
+from collections import Counter
+from utils.misra_gries import MisraGries
+
+def _stream(seed, n=20000):
+    """Zipf-ish word stream: a few heavy words over a long tail."""
+    rng = random.Random(seed)
+    heavy = ["alpha", "beta", "gamma", "delta"]
+    return [rng.choice(heavy) if rng.random() < 0.4 else f"w{rng.randrange(5000)}"
+            for _ in range(n)]
+
+class MisraGriesTests(unittest.TestCase):
+
+    def assertHeavyHittersKept(self, summary, exact):
+        total = sum(exact.values())
+        bound = total / (summary.k + 1)
+        self.assertLessEqual(len(summary), summary.k)
+        for item, n in exact.items():
+            kept = summary.counters.get(item, 0)
+            # Never overcounts, and undercounts by at most total / (k + 1)
+            self.assertLessEqual(kept, n)
+            self.assertGreaterEqual(kept, n - bound)
+            if n > bound:
+                self.assertIn(item, summary.counters)
+
+    def test_exact_under_k(self):
+        summary = MisraGries(10)
+        for word in ["ics", "uci", "ics", "edu", "ics"]:
+            summary.add(word)
+        summary.add("uci", 4)
+        self.assertEqual(summary.most_common(), [("uci", 5), ("ics", 3), ("edu", 1)])
+
+    def test_add_decrement_path(self):
+        summary = MisraGries(3)
+        summary.update({"a": 5, "b": 3, "c": 2})
+        # Full and new: everything drops by min(count, smallest counter)
+        summary.add("d")
+        self.assertEqual(dict(summary.counters), {"a": 4, "b": 2, "c": 1})
+        summary.add("e", 4)
+        self.assertEqual(dict(summary.counters), {"a": 3, "b": 1, "e": 3})
+
+    def test_update_fast_path(self):
+        summary = MisraGries(5)
+        summary.update({"a": 2, "b": 1})
+        summary.update({"a": 3, "c": 7})
+        self.assertEqual(dict(summary.counters), {"a": 5, "b": 1, "c": 7})
+
+    def test_add_keeps_heavy_hitters(self):
+        summary = MisraGries(50)
+        words = _stream(1)
+        for word in words:
+            summary.add(word)
+        self.assertHeavyHittersKept(summary, Counter(words))
+
+    def test_update_keeps_heavy_hitters(self):
+        summary = MisraGries(50)
+        exact = Counter()
+        words = _stream(2)
+        # Per-page counts, the way Report feeds the summary
+        for i in range(0, len(words), 200):
+            page = Counter(words[i:i + 200])
+            exact.update(page)
+            summary.update(page)
+        self.assertHeavyHittersKept(summary, exact)
+
+    def test_merge_keeps_heavy_hitters(self):
+        words = _stream(3)
+        halves = words[:len(words) // 2], words[len(words) // 2:]
+        merged = MisraGries(50)
+        for half in halves:
+            part = MisraGries(50)
+            for word in half:
+                part.add(word)
+            merged.merge(part)
+        self.assertHeavyHittersKept(merged, Counter(words))
+
+    def test_merge_cut(self):
+        left, right = MisraGries(2), MisraGries(2)
+        left.update({"a": 5, "b": 2})
+        right.update({"a": 1, "c": 3})
+        left.merge(right)
+        # Combined a=6, c=3, b=2: the 3rd largest (2) is subtracted from all
+        self.assertEqual(dict(left.counters), {"a": 4, "c": 1})
+
+    def test_clear(self):
+        summary = MisraGries(2)
+        summary.add("a")
+        summary.clear()
+        self.assertEqual(len(summary), 0)
+
+if __name__ == "__main__":
+    unittest.main()
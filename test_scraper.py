@@ -0,0 +1,50 @@
+import unittest
+import lxml.html
+from scraper import extract_visible_text, _html_parser
+
+def _text(html):
+    return extract_visible_text(lxml.html.document_fromstring(html))
+
+class VisibleTextTests(unittest.TestCase):
+
+    def test_noise_tags_keep_word_boundaries(self):
+        # Text on either side of a skipped tag must not run together
+        self.assertEqual(_text("<p>foo<script>var x;</script>tail</p>"), "foo tail")
+        self.assertEqual(_text("<p>foo<style>p {}</style>tail</p>"), "foo tail")
+        self.assertEqual(_text("<p>foo<!-- note -->tail</p>"), "foo tail")
+
+    def test_adjacent_elements_are_separated(self):
+        self.assertEqual(_text("<p>one<b>two</b>three</p><p>four</p>"), "one two three four")
+
+    def test_prefers_main_content(self):
+        html = ("<body><nav>menu</nav><noscript><main>hidden</main></noscript>"
+                "<div class='post-content'>wanted <svg><text>icon</text></svg>text</div></body>")
+        self.assertEqual(_text(html), "wanted text")
+
+class PageEncodingTests(unittest.TestCase):
+
+    def _decode(self, content_type, raw):
+        tree = lxml.html.document_fromstring(raw, parser=_html_parser(content_type, raw))
+        return extract_visible_text(tree)
+
+    def test_utf8_without_declaration(self):
+        raw = "<p>résumé</p>".encode("utf-8")
+        self.assertEqual(self._decode("text/html", raw), "résumé")
+        self.assertEqual(self._decode("", raw), "résumé")
+
+    def test_header_charset(self):
+        raw = "<p>résumé</p>".encode("latin-1")
+        self.assertEqual(self._decode("text/html; charset=iso-8859-1", raw), "résumé")
+        self.assertEqual(self._decode('text/html; charset="ISO-8859-1"', raw), "résumé")
+
+    def test_meta_charset(self):
+        raw = ('<html><head><meta charset="iso-8859-1"></head>'
+               '<body><p>résumé</p></body></html>').encode("latin-1")
+        self.assertEqual(self._decode("text/html", raw), "résumé")
+
+    def test_unknown_charset_falls_back_to_utf8(self):
+        raw = "<p>résumé</p>".encode("utf-8")
+        self.assertEqual(self._decode("text/html; charset=no-such-codec", raw), "résumé")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
+import random
 import unittest
+from collections import Counter
+from utils.count_min import CountMinSketch
 from trap import (
     is_trap,
     _is_too_long,
@@ -7,7 +10,8 @@ from trap import (
     _has_repetitive_patterns,
     _is_calendar_page,
     _is_path_query_overused,
-    _has_trap_query_params
+    _has_trap_query_params,
+    _split_query
 )
 
 class TrapDetectionICSTests(unittest.TestCase):
@@ -55,6 +59,36 @@ class TrapDetectionICSTests(unittest.TestCase):
         self.assertTrue(_has_trap_query_params("/calendar", "p=9999"))
         self.assertFalse(_has_trap_query_params("/faculty", "view=profile"))
 
+    def test_split_query_decoding(self):
+        # Same pairs parse_qs(keep_blank_values=True) would produce
+        self.assertEqual(_split_query("a%20b=1&c+d=x%2By"), [("a b", "1"), ("c d", "x+y")])
+        self.assertEqual(_split_query("bare&&e="), [("bare", ""), ("e", "")])
+        self.assertTrue(_has_trap_query_params("/index", "session%69d=abc"))
+        self.assertFalse(_has_trap_query_params("/index", "a%20b=1"))
+
+    def test_trap_query_bare_keys(self):
+        self.assertFalse(_has_trap_query_params("/faculty", "bare"))
+        self.assertTrue(_has_trap_query_params("/faculty", "print"))
+
+    def test_trap_query_repeated_key(self):
+        self.assertFalse(_has_trap_query_params("/search", "&".join(["k=1"] * 20)))
+        self.assertTrue(_has_trap_query_params("/search", "&".join(["k=1"] * 21)))
+
+    def test_trap_query_doku_case(self):
+        self.assertTrue(_has_trap_query_params("/doku.php", "do=show&Rev=1"))
+        self.assertTrue(_has_trap_query_params("/wiki/DOKU.PHP", "Do=show&ns=wiki"))
+        # A repeated key counts once, but keys stay case-sensitive as in
+        # parse_qs, so do and Do are two keys
+        self.assertFalse(_has_trap_query_params("/doku.php", "do=show&do=index"))
+        self.assertTrue(_has_trap_query_params("/doku.php", "do=show&Do=index"))
+        self.assertFalse(_has_trap_query_params("/index.php", "Do=show&ns=wiki"))
+
+    def test_trap_query_page_whitespace(self):
+        self.assertTrue(_has_trap_query_params("/news", "page=%20600"))
+        self.assertTrue(_has_trap_query_params("/news", "page=+600"))
+        self.assertFalse(_has_trap_query_params("/news", "page=%20500"))
+        self.assertFalse(_has_trap_query_params("/news", "page=last"))
+
     def test_is_trap_composite(self):
         trap_url = "http://ics.uci.edu/admin/dashboard"
         self.assertTrue(is_trap(trap_url))
@@ -67,5 +101,37 @@ class TrapDetectionICSTests(unittest.TestCase):
         for url in safe_urls: 
             self.assertFalse(is_trap(url))
 
+    def test_path_query_distinct_paths(self):
+        domain = "many-paths.ics.uci.edu"
+        for n in range(20000):
+            self.assertFalse(_is_path_query_overused(domain, f"/page/{n}"))
+        # The sketch only over-counts, but the limit still trips on time
+        for _ in range(50):
+            self.assertFalse(_is_path_query_overused(domain, "/search"))
+        self.assertTrue(_is_path_query_overused(domain, "/search"))
+
+class CountMinSketchTests(unittest.TestCase):
+
+    def test_never_undercounts(self):
+        # A narrow sketch forces plenty of collisions
+        sketch = CountMinSketch(width=64, depth=4)
+        rng = random.Random(121)
+        exact = Counter()
+        for _ in range(5000):
+            key = f"/path/{rng.randrange(500)}"
+            exact[key] += 1
+            self.assertGreaterEqual(sketch.add(key), exact[key])
+        for key, n in exact.items():
+            self.assertGreaterEqual(sketch.estimate(key), n)
+
+    def test_exact_without_collisions(self):
+        sketch = CountMinSketch()
+        for _ in range(3):
+            sketch.add("/a")
+        sketch.add(b"/b")
+        self.assertEqual(sketch.estimate("/a"), 3)
+        self.assertEqual(sketch.estimate("/b"), 1)
+        self.assertEqual(sketch.estimate("/c"), 0)
+
 if __name__ == "__main__":
     unittest.main()
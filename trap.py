@@ -1,7 +1,8 @@
 import re
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, unquote_plus
 from threading import Lock
 from collections import defaultdict
+from utils.count_min import CountMinSketch
 
 # External config constants (import from config.py if modularized)
 MAX_URL_LENGTH = 2000
@@ -10,30 +11,63 @@ MAX_QUERY_PARAMS = 25
 MAX_CALENDAR_PAGES_PER_DOMAIN = 250
 MAX_REPETITION_ALLOWED = 12
 MAX_PATH_QUERIES = 50
-
-# Shared counters and lock
-_cache_lock = Lock()
-_calendar_counter = defaultdict(int)
-_repetition_counter = defaultdict(int)
-_path_query_counter = defaultdict(lambda: defaultdict(int))
+PATH_QUERY_SKETCH_WIDTH = 1 << 15  # per shard; 4 rows x 4 bytes -> 512 KiB each
+
+# Keyword sets, built once rather than on every call
+_ADMIN_PREFIXES = ("/admin/", "/login/", "/logout/", "/.git/", "/.env", "/cgi-bin/")
+_ADMIN_KEYWORDS = frozenset({"wp-admin", "phpmyadmin", "administrator", "backend"})
+_TRAP_KEYS = frozenset({"sessionid", "sid", "token", "auth", "key", "print", "email"})
+_DOKU_KEYS = frozenset({"do", "tab_files", "tab_details", "image", "ns", "rev", "search"})
+_TRAP_ACTIONS = frozenset({"edit", "history", "diff", "revisions", "admin", "login", "register", "delete"})
+_CMD_KEYS = frozenset({"action", "do", "cmd"})
+_PAGINATION_KEYS = frozenset({"page", "p", "offset", "start"})
+
+# Path ending in a year, optionally followed by month and day
+_CAL_RE = re.compile(r'/\d{4}(/\d{1,2}(/\d{1,2})?)?/?$')
+
+# Shared counters, sharded by domain so workers on different hosts rarely
+# contend; shard i of every counter is guarded by _counter_locks[i]
+_COUNTER_SHARDS = 16
+_counter_locks = [Lock() for _ in range(_COUNTER_SHARDS)]
+_calendar_counters = [defaultdict(int) for _ in range(_COUNTER_SHARDS)]
+_repetition_counters = [defaultdict(int) for _ in range(_COUNTER_SHARDS)]
+# One entry per distinct path would grow without bound over a long crawl,
+# so path visits are counted approximately in fixed-size sketches
+_path_query_counters = [CountMinSketch(PATH_QUERY_SKETCH_WIDTH) for _ in range(_COUNTER_SHARDS)]
+
+def _shard(domain):
+    return hash(domain) & (_COUNTER_SHARDS - 1)
 
 def is_trap(url):
     """Return True if URL is considered a trap and should be blocked."""
     try:
         parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        path = parsed.path or "/"
-        query = parsed.query or ""
-
-        return any([
-            _is_too_long(url),
-            _has_excessive_path_depth(path),
-            _has_admin_segments(path),
-            _has_repetitive_patterns(path, domain),
-            _is_calendar_page(path, domain),
-            _is_path_query_overused(domain, path),
-            _has_trap_query_params(path, query),
-        ])
+        return _is_trap_parts(url, parsed.netloc.lower(), parsed.path, parsed.query)
+    except Exception:
+        return True
+
+def is_trap_parsed(url, parsed):
+    """
+    is_trap for an already normalized URL and its parse result; the
+    netloc is used as-is, so it must already be lowercase.
+    """
+    return _is_trap_parts(url, parsed.netloc, parsed.path, parsed.query)
+
+def _is_trap_parts(url, domain, path, query):
+    try:
+        path = path or "/"
+
+        # Short-circuits cheapest first; the counter-bumping checks come
+        # last so URLs already rejected don't take a lock or count
+        return (
+            _is_too_long(url)
+            or _has_excessive_path_depth(path)
+            or _has_admin_segments(path)
+            or _has_trap_query_params(path, query)
+            or _is_calendar_page(path, domain)
+            or _has_repetitive_patterns(path, domain)
+            or _is_path_query_overused(domain, path)
+        )
     except Exception:
         return True
 
@@ -41,73 +75,89 @@ def _is_too_long(url):
     return len(url) > MAX_URL_LENGTH
 
 def _has_excessive_path_depth(path):
+    # n slashes split a path into at most n + 1 segments
+    if path.count("/") < MAX_PATH_DEPTH:
+        return False
     return len([p for p in path.split("/") if p]) > MAX_PATH_DEPTH
 
 def _has_admin_segments(path):
-    path_lower = path.lower()
-    admin_prefixes = ["/admin/", "/login/", "/logout/", "/.git/", "/.env", "/cgi-bin/"]
-    admin_keywords = {"wp-admin", "phpmyadmin", "administrator", "backend"}
-    return any(path_lower.startswith(p) for p in admin_prefixes) or \
-           any(seg.lower() in admin_keywords for seg in path.split("/")[:3])
+    return path.lower().startswith(_ADMIN_PREFIXES) or \
+           any(seg.lower() in _ADMIN_KEYWORDS for seg in path.split("/")[:3])
 
 def _has_repetitive_patterns(path, domain):
+    # Four segments need at least three slashes between them
+    if path.count("/") < 3:
+        return False
     parts = [p for p in path.split("/") if p]
     if len(parts) >= 4:
+        shard = _shard(domain)
         for i in range(len(parts) - 3):
             if parts[i] == parts[i+2] and parts[i+1] == parts[i+3]:
-                with _cache_lock:
-                    _repetition_counter[domain] += 1
-                    if _repetition_counter[domain] > MAX_REPETITION_ALLOWED:
+                with _counter_locks[shard]:
+                    counter = _repetition_counters[shard]
+                    counter[domain] += 1
+                    if counter[domain] > MAX_REPETITION_ALLOWED:
                         return True
     return False
 
 def _is_calendar_page(path, domain):
-    if re.search(r'/\d{4}(/\d{1,2}(/\d{1,2})?)?/?$', path):
-        with _cache_lock:
-            _calendar_counter[domain] += 1
-            if _calendar_counter[domain] > MAX_CALENDAR_PAGES_PER_DOMAIN:
+    if _CAL_RE.search(path):
+        shard = _shard(domain)
+        with _counter_locks[shard]:
+            counter = _calendar_counters[shard]
+            counter[domain] += 1
+            if counter[domain] > MAX_CALENDAR_PAGES_PER_DOMAIN:
                 return True
     return False
 
 def _is_path_query_overused(domain, path):
-    with _cache_lock:
-        key = path.lower()
-        _path_query_counter[domain][key] += 1
-        if _path_query_counter[domain][key] > MAX_PATH_QUERIES:
+    shard = _shard(domain)
+    key = path.lower()
+    with _counter_locks[shard]:
+        if _path_query_counters[shard].add(domain + key) > MAX_PATH_QUERIES:
             return True
     return False
 
+def _split_query(query):
+    """(key, value) pairs of a query string, decoded like parse_qs(keep_blank_values=True)."""
+    pairs = []
+    for piece in query.split("&"):
+        if not piece:
+            continue
+        k, _, v = piece.partition("=")
+        if "%" in piece or "+" in piece:
+            k, v = unquote_plus(k), unquote_plus(v)
+        pairs.append((k, v))
+    return pairs
+
 def _has_trap_query_params(path, query):
     if not query:
         return False
 
-    params = parse_qs(query, keep_blank_values=True)
-    keys = [k.lower() for k in params]
-
-    trap_keys = {"sessionid", "sid", "token", "auth", "key", "print", "email"}
-    if any(k in trap_keys for k in keys):
-        return True
+    # One pass over the pairs; per-key counts stand in for parse_qs's dict
+    key_counts = defaultdict(int)
+    for k, v in _split_query(query):
+        key_counts[k] += 1
+        k = k.lower()
 
-    if 'doku.php' in path.lower():
-        doku_keys = {"do", "tab_files", "tab_details", "image", "ns", "rev", "search"}
-        if sum(1 for k in keys if k in doku_keys) >= 2:
+        if k in _TRAP_KEYS:
             return True
 
-    trap_actions = {"edit", "history", "diff", "revisions", "admin", "login", "register", "delete"}
-    for k, vals in params.items():
-        if k.lower() in {"action", "do", "cmd"} and any(v.lower() in trap_actions for v in vals):
+        if k in _CMD_KEYS and v.lower() in _TRAP_ACTIONS:
             return True
 
-    for k, vals in params.items():
-        if k.lower() in {"page", "p", "offset", "start"}:
-            for v in vals:
-                try:
-                    if int(v) > 500:
-                        return True
-                except:
-                    continue
+        if k in _PAGINATION_KEYS:
+            try:
+                if int(v) > 500:
+                    return True
+            except ValueError:
+                pass
+
+    if 'doku.php' in path.lower():
+        if sum(1 for k in key_counts if k.lower() in _DOKU_KEYS) >= 2:
+            return True
 
-    if len(params) > MAX_QUERY_PARAMS or any(len(v) > 20 for v in params.values()):
+    if len(key_counts) > MAX_QUERY_PARAMS or any(n > 20 for n in key_counts.values()):
         return True
 
     return False
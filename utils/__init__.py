@@ -1,6 +1,6 @@
 import os
 import logging
-from hashlib import sha256
+from hashlib import blake2b
 from urllib.parse import urlparse
 
 def get_logger(name, filename=None):
@@ -24,12 +24,37 @@ def get_logger(name, filename=None):
 
 def get_urlhash(url):
     parsed = urlparse(url)
-    # everything other than scheme.
-    return sha256(
+    # everything other than scheme, as an 8-byte digest (compact BLOB key).
+    return blake2b(
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8"),
+        digest_size=8).digest()
+
+def hash_indexes(key, n, m):
+    """n indexes in range(m) for a str/bytes key, for Bloom/Count-Min rows."""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    digest = blake2b(key, digest_size=16).digest()
+    # Double hashing: n indexes from two 64-bit halves of one digest
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % m for i in range(n)]
 
 def normalize(url):
     if url.endswith("/"):
         return url.rstrip("/")
     return url
+
+
+def get_domain(url):
+    """Lowercased netloc of an absolute URL, without a full urlparse."""
+    start = url.find("://")
+    if start == -1:
+        return urlparse(url).netloc.lower()
+    start += 3
+    end = len(url)
+    for sep in "/?#":
+        i = url.find(sep, start, end)
+        if i != -1:
+            end = i
+    return url[start:end].lower()
@@ -0,0 +1,64 @@
+import math
+from utils import hash_indexes
+
+
+class BloomFilter(object):
+    """Fixed-capacity Bloom filter over str/bytes keys."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(
+            self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _indexes(self, key):
+        return hash_indexes(key, self.num_hashes, self.num_bits)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for i in self._indexes(key):
+            if not bits[i >> 3] & (1 << (i & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        bits = self.bits
+        for i in self._indexes(key):
+            bits[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter(object):
+    """
+    Bloom filter that grows by chaining larger filters once the current
+    one is full, keeping the overall false-positive rate under error_rate.
+    """
+
+    GROWTH = 2
+    TIGHTENING_RATIO = 0.9
+
+    def __init__(self, initial_capacity=1_000_000, error_rate=1e-7):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.filters = []
+
+    def __contains__(self, key):
+        return any(key in f for f in reversed(self.filters))
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    def add(self, key):
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            if not self.filters:
+                capacity = self.initial_capacity
+                error_rate = self.error_rate * (1.0 - self.TIGHTENING_RATIO)
+            else:
+                capacity = self.filters[-1].capacity * self.GROWTH
+                error_rate = self.filters[-1].error_rate * self.TIGHTENING_RATIO
+            self.filters.append(BloomFilter(capacity, error_rate))
+        self.filters[-1].add(key)
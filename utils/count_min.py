@@ -0,0 +1,32 @@
+from array import array
+from utils import hash_indexes
+
+
+class CountMinSketch(object):
+    """
+    Fixed-size Count-Min sketch over str/bytes keys.
+    Estimates never undercount; with conservative update the overcount
+    stays well below the classic total / width bound.
+    """
+
+    def __init__(self, width=1 << 16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", [0]) * width for _ in range(depth)]
+
+    def _indexes(self, key):
+        return hash_indexes(key, self.depth, self.width)
+
+    def add(self, key):
+        """Count one occurrence of key and return its new estimate."""
+        indexes = self._indexes(key)
+        rows = self.rows
+        estimate = min(row[i] for row, i in zip(rows, indexes)) + 1
+        # Conservative update: only raise cells that are below the estimate
+        for row, i in zip(rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+        return estimate
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
@@ -0,0 +1,59 @@
+from collections import Counter
+
+
+class MisraGries(object):
+    """
+    Misra-Gries heavy-hitters summary holding at most k counters.
+    Counts are exact while at most k distinct items have been seen; past
+    that each count is an underestimate by at most total_weight / (k + 1),
+    so any item heavier than that is guaranteed to be kept.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.counters = Counter()
+
+    def __len__(self):
+        return len(self.counters)
+
+    def add(self, item, count=1):
+        counters = self.counters
+        if item in counters or len(counters) < self.k:
+            counters[item] += count
+            return
+        # Full and item is new: decrement everything (item included) by
+        # the smallest amount that frees a slot or uses up the item.
+        dec = min(count, min(counters.values()))
+        for key in list(counters):
+            remaining = counters[key] - dec
+            if remaining > 0:
+                counters[key] = remaining
+            else:
+                del counters[key]
+        if count > dec:
+            counters[item] = count - dec
+
+    def update(self, counts):
+        """Add every (item, count) pair of a mapping."""
+        counters = self.counters
+        if len(counters) + len(counts) <= self.k:
+            counters.update(counts)
+            return
+        for item, count in counts.items():
+            self.add(item, count)
+
+    def merge(self, other):
+        """Fold another summary into this one (mergeable-summary rule)."""
+        counters = self.counters
+        counters.update(other.counters)
+        if len(counters) > self.k:
+            # Subtract the (k+1)-th largest count and keep what stays positive
+            cut = counters.most_common(self.k + 1)[-1][1]
+            self.counters = Counter(
+                {key: c - cut for key, c in counters.items() if c > cut})
+
+    def most_common(self, n=None):
+        return self.counters.most_common(n)
+
+    def clear(self):
+        self.counters.clear()